@@ -1,8 +1,7 @@
 import logging
 import os
 
-from flask import (Flask, redirect, render_template, request,
-                   send_from_directory, url_for)
+from flask import Flask, redirect, request, send_from_directory, url_for
 from azure.monitor.opentelemetry import configure_azure_monitor
 
 configure_azure_monitor()
@@ -12,42 +11,67 @@ logger.setLevel(logging.INFO)
 
 app = Flask(__name__)
 
+# Both templates are static, so resolve them through the loader once at import
+index_template = app.jinja_env.get_template('index.html')
+hello_template = app.jinja_env.get_template('hello.html')
+
 
 @app.route('/')
 def index():
    logger.info('Request for index page received')
-   return render_template('index.html')
+   return index_template.render()
 
 @app.route('/favicon.ico')
 def favicon():
     return send_from_directory(os.path.join(app.root_path, 'static'),
                                'favicon.ico', mimetype='image/vnd.microsoft.icon')
 
+class CustomError(Exception):
+    pass
+
+def raise_exception():
+   raise Exception("Generic test exception")
+
+def raise_value_error():
+   raise ValueError("This is a ValueError for testing")
+
+def raise_key_error():
+   raise KeyError("This is a KeyError for testing")
+
+def raise_zero_division():
+   return str(1 / 0)  # Triggers ZeroDivisionError
+
+def raise_type_error():
+   return "Length is: " + len(5)  # TypeError: object of type 'int' has no len()
+
+def raise_custom_error():
+   raise CustomError("This is a custom-defined exception")
+
+# Names that trigger a test exception, looked up by their lowercased form
+exception_triggers = {
+   "exception": raise_exception,
+   "valueerror": raise_value_error,
+   "keyerror": raise_key_error,
+   "zerodivision": raise_zero_division,
+   "typeerror": raise_type_error,
+   "customerror": raise_custom_error,
+}
+
 @app.route('/hello', methods=['POST'])
 def hello():
    name = request.form.get('name')
 
-   if name.lower() == "exception":
-       raise Exception("Generic test exception")
-   elif name.lower() == "valueerror":
-       raise ValueError("This is a ValueError for testing")
-   elif name.lower() == "keyerror":
-       raise KeyError("This is a KeyError for testing")
-   elif name.lower() == "zerodivision":
-       return str(1 / 0)  # Triggers ZeroDivisionError
-   elif name.lower() == "typeerror":
-       return "Length is: " + len(5)  # TypeError: object of type 'int' has no len()
-   elif name.lower() == "customerror":
-    class CustomError(Exception):
-        pass
-    raise CustomError("This is a custom-defined exception")
+   trigger = exception_triggers.get(name.lower()) if name else None
+   if trigger:
+    return trigger()
    elif name:
-    logger.info('Request for hello page received with name=%s' % name)
-    return render_template('hello.html', name = name)
+    logger.info('Request for hello page received with name=%s', name)
+    return hello_template.render(name = name)
    else:
     logger.info('Request for hello page received with no name or blank name -- redirecting')
     return redirect(url_for('index'))
 
 
+# Development server only, production runs under gunicorn (see gunicorn.conf.py)
 if __name__ == '__main__':
-   app.run()
+   app.run(threaded=True)
@@ -1,28 +1,339 @@
+import asyncio
 from datetime import datetime
-import json
+from functools import lru_cache
+import hmac
 import logging
 import os
+import random
+import re
+import socket
 import textwrap
+import time
+from typing import TYPE_CHECKING, Any, Awaitable, Callable
+from urllib.parse import urlsplit
 
 import azure.functions as func
-import requests
+from azure.functions.warmup import WarmUpContext
+import orjson
+
+if TYPE_CHECKING:
+    import httpx
 
 app = func.FunctionApp()
 
-SLACK_WEBHOOK_URL = os.environ.get("SLACK_WEBHOOK_URL")
-FUNCTION_KEY = os.environ.get("AZURE_FUNCTION_KEY")
-APPINSIGHTS_API_KEY = os.environ.get("APPINSIGHTS_API_KEY")
+logger = logging.getLogger(__name__)
+
+
+def get_required_setting(name: str) -> str:
+    """
+    Reads a required app setting from the environment.
+    Raises at import so a misconfigured instance fails on startup rather than on every alert.
+    """
+    value = os.environ.get(name)
+    if not value:
+        raise RuntimeError(f"{name} is not configured.")
+    return value
+
+
+SLACK_WEBHOOK_URL = get_required_setting("SLACK_WEBHOOK_URL")
+_slack_webhook_parts = urlsplit(SLACK_WEBHOOK_URL)
+if _slack_webhook_parts.scheme != "https" or not _slack_webhook_parts.hostname:
+    raise RuntimeError("SLACK_WEBHOOK_URL is not a valid https URL.")
+FUNCTION_KEY = get_required_setting("AZURE_FUNCTION_KEY").encode()  # bytes for hmac.compare_digest
+APPINSIGHTS_API_KEY = get_required_setting("APPINSIGHTS_API_KEY")
 PRODUCTION_ALERT_RULE = "qr-error"
+CONNECT_TIMEOUT = 3  # seconds
+REQUEST_TIMEOUT = 10  # seconds
+POOL_MAX_KEEPALIVE = 4  # each pool only talks to a single host, so it is kept small
+POOL_MAX_CONNECTIONS = 10
+# Azure's load balancers drop idle TCP connections after 4 minutes,
+# so pooled sockets send keepalive probes well before that
+TCP_KEEPALIVE_IDLE = 120  # seconds
+TCP_KEEPALIVE_INTERVAL = 30  # seconds
+TCP_KEEPALIVE_COUNT = 3
+SEARCH_RESULTS_CACHE_SIZE = 128
+SEARCH_RESULTS_CACHE_TTL = 60  # seconds
+SELECTED_COLUMNS = ("outerMessage", "details")
+ESSENTIALS_FIELDS = ("alertRule", "severity", "alertId", "firedDateTime", "investigationLink")
+SLACK_CONNECT_TIMEOUT = 3.05  # seconds, just above a TCP retransmission window
+SLACK_READ_TIMEOUT = 5  # seconds, slightly above p95 Slack webhook latency
+SLACK_HEADERS = {"Content-Type": "application/json"}
+SLACK_PAYLOAD_PREFIX = b'{"text":'  # the payload is always {"text": message}
+SLACK_PAYLOAD_SUFFIX = b"}"
+SLACK_MAX_RETRIES = 4
+SLACK_RETRY_BASE_DELAY = 1  # seconds
+SLACK_RETRY_MAX_DELAY = 32  # seconds
+SLACK_RETRY_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+SLACK_BREAKER_FAIL_MAX = 5
+SLACK_BREAKER_RESET_TIMEOUT = 30  # seconds
+SLACK_BATCH_WINDOW = 0.2  # seconds
+SLACK_BATCH_MAX_SIZE = 20
+SLACK_BATCH_MAX_LENGTH = 40000  # Slack truncates message text beyond 40,000 characters
+SLACK_BATCH_SEPARATOR = "\n\n---\n\n"
+SLACK_MAX_CONCURRENT_POSTS = 8
+SLACK_MAX_WAITING_POSTS = 32
+SLACK_MAX_BULKHEAD_WAIT = 30  # seconds
+# connect, pool, write and read each get their own timeout, so one attempt can take their sum
+SLACK_ATTEMPT_TIMEOUT = SLACK_CONNECT_TIMEOUT + 3 * SLACK_READ_TIMEOUT  # seconds
+SLACK_POST_TIMEOUT = 60  # seconds, for post_to_slack and its retries
+SLACK_SEND_TIMEOUT = SLACK_BATCH_WINDOW + SLACK_MAX_BULKHEAD_WAIT + SLACK_POST_TIMEOUT  # seconds
+SLACK_ALERTS_QUEUE = "slack-alerts"
+SLACK_ALERTS_MAX_MESSAGE_SIZE = 48 * 1024  # bytes, Storage Queue messages are capped at 64KB after base64 encoding
+SLACK_ALERTS_MAX_DEQUEUE_COUNT = 10  # matches extensions.queues.maxDequeueCount in host.json
+SLACK_SHORT_CIRCUIT_RETRY_DELAY = 1  # seconds
+FUNCTION_TIMEOUT = 300  # seconds, matches functionTimeout in host.json
+# A timed out invocation restarts the worker and drops every alert in flight on it, so each
+# delivery gives up with time to spare. A send is only started while SLACK_SEND_TIMEOUT is
+# left and is never cancelled once started, since that could post the alert and still leave it
+# on the queue. An alert turned away by the breaker or bulkhead, or whose post failed with a
+# retryable error, tries again within that budget instead of using up a dequeue. Each dequeue
+# therefore lasts close to 240 seconds while Slack is down, and with the 1 minute visibilityTimeout
+# in host.json the queue rides out about 10 * (240 + 60) seconds = 50 minutes before an alert is poisoned
+SLACK_DELIVERY_TIMEOUT = FUNCTION_TIMEOUT - 60  # seconds
+# Azure Monitor's own date form, with the field ranges checked so other input is parsed by fromisoformat
+AZURE_ALERT_DATE = re.compile(
+    r"\d{4}-(0[1-9]|1[0-2])-(0[1-9]|[12]\d|3[01])T([01]\d|2[0-3]):[0-5]\d:[0-5]\d(\.\d+)?Z\Z"
+)
+SLACK_MESSAGE_SEPARATOR = "-" * 51
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised when a call is short-circuited because the circuit breaker is open.
+    """
+
+
+class CircuitBreaker:
+    """
+    Stops calling a failing dependency after fail_max consecutive failures.
+    Once reset_timeout seconds have passed, a single trial call is let through (half open):
+    a success closes the breaker again, a failure re-opens it for another reset_timeout.
+    """
+
+    def __init__(self, fail_max: int, reset_timeout: float):
+        self.fail_max = fail_max
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: float | None = None
+        self.trial_in_flight = False
+
+    def get_retry_after(self) -> float | None:
+        """
+        Returns the seconds until calls may be let through again, or None if they are allowed now.
+        """
+        if self.opened_at is None:
+            return None
+        remaining = self.opened_at + self.reset_timeout - time.monotonic()
+        if remaining > 0:
+            return remaining
+        return 1 if self.trial_in_flight else None
+
+    def before_call(self) -> None:
+        """
+        Raises CircuitOpenError if the call should be short-circuited.
+        """
+        if self.get_retry_after() is not None:
+            raise CircuitOpenError("Circuit breaker is open.")
+        if self.opened_at is not None:
+            self.trial_in_flight = True
+
+    def record_success(self) -> None:
+        """
+        Closes the breaker and resets the failure count.
+        """
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    def record_failure(self) -> None:
+        """
+        Counts a failure, opening the breaker at fail_max or when the half open trial fails.
+        """
+        self.failures += 1
+        if self.opened_at is not None or self.failures >= self.fail_max:
+            self.opened_at = time.monotonic()
+        self.trial_in_flight = False
+
+    def release_trial(self) -> None:
+        """
+        Frees the half open trial slot when the trial ended without a result, e.g. it was cancelled.
+        """
+        self.trial_in_flight = False
+
+
+class BulkheadFullError(Exception):
+    """
+    Raised when a call is rejected because the bulkhead's wait queue is full or no slot freed up in time.
+    """
 
 
-def format_item(key: str, value: str | None) -> str:
+class Bulkhead:
     """
-    Formats a key-value pair for the Slack message with bolded key.
-    Returns "N/A" if the value is None.
+    Async context manager that caps concurrent calls to a dependency.
+    Up to max_waiting more calls wait up to max_wait seconds for a free slot, calls beyond
+    that are rejected with BulkheadFullError instead of piling up in memory.
     """
-    if value is None:
-        value = "N/A"
-    return f"*{key}*: {value}"
+
+    def __init__(self, max_concurrent: int, max_waiting: int, max_wait: float):
+        self.semaphore = asyncio.Semaphore(max_concurrent)
+        self.max_waiting = max_waiting
+        self.max_wait = max_wait
+        self.waiting = 0
+
+    async def __aenter__(self) -> None:
+        if self.semaphore.locked() and self.waiting >= self.max_waiting:
+            raise BulkheadFullError("Too many calls waiting.")
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self.semaphore.acquire(), self.max_wait)
+        except asyncio.TimeoutError:
+            raise BulkheadFullError("Timed out waiting for a free slot.") from None
+        finally:
+            self.waiting -= 1
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        self.semaphore.release()
+
+
+class MessageBatcher:
+    """
+    Collects messages added within a short window and sends them joined together in one call.
+    A batch is sent window seconds after its first message, or as soon as it is full.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[str], Awaitable[Any]],
+        window: float,
+        max_size: int,
+        max_length: int,
+        separator: str,
+    ):
+        self.send = send
+        self.window = window
+        self.max_size = max_size
+        self.max_length = max_length
+        self.separator = separator
+        self.messages: list[str] = []
+        self.length = 0
+        self.batch: asyncio.Task | None = None
+        self.full = asyncio.Event()
+
+    async def add(self, message: str) -> Any:
+        """
+        Adds the message to the open batch and returns the result of sending that batch.
+        """
+        if self.batch is not None and self.length + len(self.separator) + len(message) > self.max_length:
+            self.close_batch()
+        if self.batch is None:
+            self.messages, self.length, self.full = [], 0, asyncio.Event()
+            self.batch = asyncio.create_task(self.send_batch(self.messages, self.full))
+        batch = self.batch
+        self.messages.append(message)
+        self.length += len(self.separator) + len(message)
+        if len(self.messages) >= self.max_size:
+            self.close_batch()
+        return await asyncio.shield(batch)  # one cancelled caller shouldn't cancel everyone's batch
+
+    def close_batch(self) -> None:
+        """
+        Sends the open batch now and starts a new one for the next message.
+        """
+        self.full.set()
+        self.batch = None
+
+    async def send_batch(self, messages: list[str], full: asyncio.Event) -> Any:
+        """
+        Waits for the batch window to end or the batch to fill up, then sends it.
+        """
+        try:
+            await asyncio.wait_for(full.wait(), self.window)
+        except asyncio.TimeoutError:
+            pass
+        if self.batch is asyncio.current_task():
+            self.batch = None
+        return await self.send(self.separator.join(messages))
+
+
+# The breaker, the bulkhead, the search results cache and _slack_batcher below need no locking: only the async
+# deliver_alert_to_slack uses them, on the worker's event loop, while the sync HTTP and warmup handlers run on
+# its thread pool. The lazily created _clients and _transports are shared with warmup on that pool, so they are
+# only ever stored with dict.setdefault, which is atomic: if both sides create one, every caller gets the first
+_slack_breaker = CircuitBreaker(SLACK_BREAKER_FAIL_MAX, SLACK_BREAKER_RESET_TIMEOUT)
+_slack_bulkhead = Bulkhead(SLACK_MAX_CONCURRENT_POSTS, SLACK_MAX_WAITING_POSTS, SLACK_MAX_BULKHEAD_WAIT)
+_clients: dict[str, "httpx.AsyncClient"] = {}
+_transports: dict[str, "httpx.AsyncHTTPTransport"] = {}
+_search_results_cache: dict[str, tuple[float, dict]] = {}  # api_link -> (fetched at, results)
+
+
+def get_socket_options() -> list[tuple[int, int, int]]:
+    """
+    Returns the TCP keepalive socket options for pooled connections.
+    The per-socket timings are Linux only, which is what Azure Functions runs on.
+    """
+    options = [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+    if hasattr(socket, "TCP_KEEPIDLE"):
+        options += [
+            (socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, TCP_KEEPALIVE_IDLE),
+            (socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, TCP_KEEPALIVE_INTERVAL),
+            (socket.IPPROTO_TCP, socket.TCP_KEEPCNT, TCP_KEEPALIVE_COUNT),
+        ]
+    return options
+
+
+def create_transport() -> "httpx.AsyncHTTPTransport":
+    """
+    Creates a pooled httpx transport with keepalive sockets.
+    HTTP/2 is negotiated where the host supports it so concurrent requests share one connection.
+    """
+    import httpx
+
+    return httpx.AsyncHTTPTransport(
+        http2=True,
+        limits=httpx.Limits(max_keepalive_connections=POOL_MAX_KEEPALIVE, max_connections=POOL_MAX_CONNECTIONS),
+        socket_options=get_socket_options(),
+    )
+
+
+def get_client(name: str) -> "httpx.AsyncClient":
+    """
+    Returns the named httpx AsyncClient on its own pooled transport.
+    httpx is imported on first use to keep it off the cold start path, and the
+    clients live at module scope so warm invocations reuse keep-alive connections.
+    """
+    client = _clients.get(name)
+    if client is None:
+        import httpx
+
+        client = httpx.AsyncClient(
+            transport=create_transport(),
+            timeout=httpx.Timeout(REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT),
+        )
+        client = _clients.setdefault(name, client)
+    return client
+
+
+@lru_cache(maxsize=1)
+def get_slack_url() -> "httpx.URL":
+    """
+    Parses the Slack webhook URL once so each post doesn't parse it again.
+    """
+    import httpx
+
+    return httpx.URL(SLACK_WEBHOOK_URL)
+
+
+def get_slack_transport() -> "httpx.AsyncHTTPTransport":
+    """
+    Returns the pooled httpx transport used for Slack posts.
+    Slack posts always go to the one webhook URL and need none of the client's redirect,
+    cookie or auth handling, so they skip the client and go straight to the transport.
+    """
+    transport = _transports.get("slack")
+    if transport is None:
+        transport = _transports.setdefault("slack", create_transport())
+    return transport
+
 
 def format_alert_date(date_str: str | None) -> str:
     """
@@ -31,6 +342,10 @@ def format_alert_date(date_str: str | None) -> str:
     """
     if not date_str:
         return "N/A"
+    # Azure Monitor sends ISO dates like 2024-01-01T12:00:00.1234567Z, so slicing off
+    # the fractional seconds already gives the formatted string without parsing it
+    if AZURE_ALERT_DATE.match(date_str):
+        return date_str[:19] + "Z"
     try:
         date_obj = datetime.fromisoformat(date_str)
         return date_obj.replace(microsecond=0).strftime("%Y-%m-%dT%H:%M:%SZ")
@@ -42,14 +357,32 @@ def format_raw_stack(raw_stack: str) -> str:
     """
     Truncate long raw stack traces for better readability in Slack messages.
     Returns the original stack trace if it's short enough.
+    Windows (\\r\\n) and old Mac (\\r) line endings are normalised to \\n.
     """
     stack = textwrap.dedent(raw_stack).strip()
-    lines = stack.splitlines()
-    if len(lines) > 20:
-        first_10_lines = "\n".join(lines[:10])
-        last_10_lines = "\n".join(lines[-10:])
-        stack = f"{first_10_lines}\n ... \n{last_10_lines}"
-    return stack
+    if "\r" in stack:
+        stack = stack.replace("\r\n", "\n").replace("\r", "\n")
+    if stack.count("\n") < 20:  # 20 lines or fewer
+        return stack
+    # Slice around the boundary newlines instead of building a list of every line
+    first_10_end = -1
+    for _ in range(10):
+        first_10_end = stack.find("\n", first_10_end + 1)
+    last_10_start = len(stack)
+    for _ in range(10):
+        last_10_start = stack.rfind("\n", 0, last_10_start)
+    return f"{stack[:first_10_end]}\n ... \n{stack[last_10_start + 1:]}"
+
+
+def format_log_payload(data: dict) -> str:
+    """
+    Pretty prints a payload for logging, truncated to roughly 10KB.
+    Azure limits log entries to 64KB.
+    """
+    data_str = orjson.dumps(data, option=orjson.OPT_INDENT_2).decode()  # pretty print 2 spaces indent
+    if len(data_str) > 10000:  # 1 byte per character
+        data_str = data_str[:10000] + "... [truncated]"
+    return data_str
 
 
 def validate_function_key(key: str) -> func.HttpResponse | None:
@@ -59,49 +392,73 @@ def validate_function_key(key: str) -> func.HttpResponse | None:
     """
     if not key:
         return func.HttpResponse("Missing code authentication.", status_code=401)
-    if key != FUNCTION_KEY:
-        logging.warning("Invalid code provided.")
+    if not hmac.compare_digest(key.encode(), FUNCTION_KEY):
+        logger.warning("Invalid code provided.")
         return func.HttpResponse("Unauthorized: invalid code.", status_code=403)
     return None
 
 
-def fetch_search_results(api_link: str) -> dict:
+def cache_search_results(api_link: str, results: dict) -> None:
+    """
+    Caches search results by link, evicting the oldest entry once the cache is full.
+    """
+    _search_results_cache.pop(api_link, None)
+    if len(_search_results_cache) >= SEARCH_RESULTS_CACHE_SIZE:
+        del _search_results_cache[next(iter(_search_results_cache))]
+    _search_results_cache[api_link] = (time.monotonic(), results)
+
+
+async def fetch_search_results(api_link: str) -> dict:
     """
     Fetches log details from the Search Results API.
+    Azure Monitor can deliver the same alert more than once, so results are cached
+    for a short time by link. Callers must not mutate the returned dict.
     """
+    import httpx
+
+    cached = _search_results_cache.get(api_link)
+    if cached and time.monotonic() - cached[0] < SEARCH_RESULTS_CACHE_TTL:
+        logger.info("Using cached log details for API: %s", api_link)
+        return cached[1]
+
     headers = {"x-api-key": APPINSIGHTS_API_KEY}
     try:
-        logging.info(f"Fetching log details from API: {api_link}")
-        response = requests.get(api_link, headers=headers)
+        logger.info("Fetching log details from API: %s", api_link)
+        response = await get_client("appinsights").get(api_link, headers=headers)
         response.raise_for_status()
-        data = response.json()
-        data_str = json.dumps(data, indent=2)  # pretty print 2 spaces indent
-        if len(data_str) > 10000:  # 1 byte per character, roughly 10KB, Azure limits to 64KB
-            data_str = data_str[:10000] + "... [truncated]"
-        logging.info(f"Fetched log details: {data_str}")
-        return data["tables"][0] if data["tables"] else {}
-    except requests.exceptions.RequestException as e:
-        logging.error(f"Error fetching log details from API: {e}")
+        data = orjson.loads(response.content)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Fetched log details: %s", format_log_payload(data))
+        results = data["tables"][0] if data["tables"] else {}
+        cache_search_results(api_link, results)
+        return results
+    except (httpx.HTTPError, httpx.InvalidURL, orjson.JSONDecodeError) as e:
+        logger.error("Error fetching log details from API: %s", e)
         return {"error": "Failed to fetch log details."}
 
 
+@lru_cache(maxsize=32)
+def get_selected_column_indexes(column_names: tuple[str, ...]) -> dict[str, int]:
+    """
+    Maps each selected column to its index in the result schema.
+    The schema is stable per alert rule, so the map is cached by column names.
+    """
+    column_indexes = {name: i for i, name in enumerate(column_names)}
+    return {col: column_indexes[col] for col in SELECTED_COLUMNS if col in column_indexes}
+
+
 def select_search_results(data: dict) -> dict:
     """
     Selects specific columns from the full log details data.
     """
     json_columns: list[dict] = data["columns"]
-    columns = [col["name"] for col in json_columns]
     rows: list[list[str | None | int]] = data["rows"]
+    if not rows:
+        return {}
 
-    selected_columns = ["outerMessage", "details"]
-    selected_columns_indexes = {col: columns.index(col) for col in selected_columns}
-
-    details = {}
-    for row in rows:  # only one row expected but loop anyway
-        entry = {col: row[selected_columns_indexes[col]] for col in selected_columns}
-        details.update(entry)
-
-    return details
+    selected_columns_indexes = get_selected_column_indexes(tuple(col["name"] for col in json_columns))
+    row = rows[0]  # only one row expected
+    return {col: row[i] for col, i in selected_columns_indexes.items()}
 
 
 def format_search_results(data: dict) -> str:
@@ -113,30 +470,50 @@ def format_search_results(data: dict) -> str:
     formatted_lines = []
     
     message = data.get("outerMessage","")
-    formatted_lines.append(format_item("Message", message))
+    formatted_lines.append(f"*Message*: {'N/A' if message is None else message}")
 
     details = data.get("details","")
-    try:
-        details = json.loads(details)
-        if isinstance(details, list):
-            details_item = details[0]
-            rawstack = details_item.get("rawStack","")
-            stack = format_raw_stack(rawstack)
-            formatted_lines.append(f"*Details*:\n```\n{stack}\n```")
-        else:
-            formatted_lines.append(format_item("Details", details))
-    except json.JSONDecodeError:
-        formatted_lines.append(format_item("Details", details))
-    
+    if isinstance(details, str) and details[:1] in ("[", "{"):  # skip parsing plain strings
+        try:
+            details = orjson.loads(details)
+        except orjson.JSONDecodeError:
+            pass
+    if isinstance(details, list) and details:
+        rawstack = details[0].get("rawStack","")
+        stack = format_raw_stack(rawstack)
+        formatted_lines.append(f"*Details*:\n```\n{stack}\n```")
+    else:
+        formatted_lines.append(f"*Details*: {'N/A' if details is None else details}")
+
     formatted_message = "\n".join(formatted_lines) + "\n"
     return formatted_message
 
 
-def get_details_string(data: dict) -> str:
-    alert_context = data.get("alertContext", {})
-    condition = alert_context.get("condition", {})
-    api_link = condition.get("allOf", [{}])[0].get("linkToSearchResultsAPI", "#")
-    search_results = fetch_search_results(api_link)
+def get_search_results_link(data: dict) -> str:
+    """
+    Returns the App Insights search results API link from the alert data, or "#" if there is none.
+    """
+    try:
+        return data["alertContext"]["condition"]["allOf"][0]["linkToSearchResultsAPI"]
+    except (KeyError, IndexError, TypeError):
+        return "#"
+
+
+def get_queued_alert(data: dict) -> dict:
+    """
+    Trims the alert data down to the fields deliver_alert_to_slack reads, keeping the same shape.
+    Alert payloads can be far larger than a Storage Queue message allows.
+    """
+    essentials = data.get("essentials", {})
+    return {
+        "essentials": {field: essentials[field] for field in ESSENTIALS_FIELDS if field in essentials},
+        "alertContext": {"condition": {"allOf": [{"linkToSearchResultsAPI": get_search_results_link(data)}]}},
+    }
+
+
+async def get_details_string(data: dict) -> str:
+    api_link = get_search_results_link(data)
+    search_results = await fetch_search_results(api_link)
     selected_search_results = select_search_results(search_results) if "error" not in search_results else {}
     details_str = format_search_results(selected_search_results)
     return details_str
@@ -148,76 +525,194 @@ def build_slack_message(data: dict, details: str) -> str:
     """
     # See https://learn.microsoft.com/en-us/azure/azure-monitor/alerts/alerts-common-schema for available fields
     essentials = data.get("essentials", {})
-    alert_id = essentials.get("alertId", "N/A")
-    alert_rule = essentials.get("alertRule", "N/A")
-    emoji_prefix = ""
-    if alert_rule == PRODUCTION_ALERT_RULE:
-        emoji_prefix = "🚨 "
-    severity = essentials.get("severity", "N/A")
-    fired_date_time = format_alert_date(essentials.get("firedDateTime"))
-    investigation_link = essentials.get("investigationLink", "#")
-
-    alert_id_str = format_item("Alert ID", alert_id)
-    severity_str = format_item("Severity", severity)
-    date_str = format_item("Date", fired_date_time) 
-    
-    message = (
-        f"{emoji_prefix}*Azure Alert Fired: {alert_rule}*\n\n"
-        f"{severity_str}\n"
-        f"{date_str}\n"
-        f"{alert_id_str}\n\n"
-        f"---------------------------------------------------\n"
+    # The alert schema is fixed, so look up each field directly instead of going through a template
+    alert_rule = essentials.get("alertRule")
+    severity = essentials.get("severity")
+    alert_id = essentials.get("alertId")
+    investigation_link = essentials.get("investigationLink")
+    emoji_prefix = "🚨 " if alert_rule == PRODUCTION_ALERT_RULE else ""
+
+    # Missing or null fields render as "N/A"
+    return (
+        f"{emoji_prefix}*Azure Alert Fired: {'N/A' if alert_rule is None else alert_rule}*\n\n"
+        f"*Severity*: {'N/A' if severity is None else severity}\n"
+        f"*Date*: {format_alert_date(essentials.get('firedDateTime'))}\n"
+        f"*Alert ID*: {'N/A' if alert_id is None else alert_id}\n\n"
+        f"{SLACK_MESSAGE_SEPARATOR}\n"
         f"{details}"
-        f"<{investigation_link}|Click here to investigate in Azure Portal>"
+        f"<{'#' if investigation_link is None else investigation_link}|Click here to investigate in Azure Portal>"
     )
 
-    return message
 
+def get_slack_retry_delay(attempt: int, response: "httpx.Response | None" = None) -> float:
+    """
+    Returns how long to wait before retrying a Slack post, using exponential backoff with full jitter.
+    Slack's Retry-After header is honoured when it sends one.
+    """
+    retry_after = response.headers.get("Retry-After", "") if response is not None else ""
+    if retry_after.isdigit():
+        return min(float(retry_after), SLACK_RETRY_MAX_DELAY)
+    return random.uniform(0, min(SLACK_RETRY_BASE_DELAY * 2**attempt, SLACK_RETRY_MAX_DELAY))
+
+
+async def post_to_slack(message: str, deadline: float) -> "httpx.Response":
+    """
+    Posts the message to the Slack webhook, raising on bad status codes.
+    Connection errors (including dropped keep-alive connections), timeouts, 429s and 5xx responses
+    are retried while another attempt still fits before deadline (a time.monotonic() value);
+    other 4xx responses are not.
+    """
+    import httpx
+
+    payload = SLACK_PAYLOAD_PREFIX + orjson.dumps(message) + SLACK_PAYLOAD_SUFFIX
+    timeout = httpx.Timeout(SLACK_READ_TIMEOUT, connect=SLACK_CONNECT_TIMEOUT)
+    request = httpx.Request(
+        "POST",
+        get_slack_url(),
+        content=payload,
+        headers=SLACK_HEADERS,
+        extensions={"timeout": timeout.as_dict()},
+    )
+    for attempt in range(SLACK_MAX_RETRIES + 1):
+        try:
+            response = await get_slack_transport().handle_async_request(request)
+            await response.aread()  # reads the body and releases the connection back to the pool
+            response.request = request  # needed by raise_for_status
+        except (httpx.NetworkError, httpx.ProtocolError, httpx.TimeoutException) as e:
+            delay = get_slack_retry_delay(attempt)
+            if attempt == SLACK_MAX_RETRIES or time.monotonic() + delay + SLACK_ATTEMPT_TIMEOUT > deadline:
+                raise
+            logger.warning("Error sending message to Slack, retrying in %.1fs: %s", delay, e)
+        else:
+            if response.status_code not in SLACK_RETRY_STATUS_CODES:
+                response.raise_for_status()  # Raise an exception for bad status codes
+                return response
+            delay = get_slack_retry_delay(attempt, response)
+            if attempt == SLACK_MAX_RETRIES or time.monotonic() + delay + SLACK_ATTEMPT_TIMEOUT > deadline:
+                response.raise_for_status()
+            logger.warning("Slack returned %s, retrying in %.1fs.", response.status_code, delay)
+        await asyncio.sleep(delay)
 
-def send_to_slack(message: str) -> func.HttpResponse:
-    payload = {"text": message}
-    try:
-        response = requests.post(SLACK_WEBHOOK_URL, json=payload)
-        response.raise_for_status()  # Raise an exception for bad status codes
-        logging.info(f"Successfully sent message to Slack. Status: {response.status_code}")
-        return func.HttpResponse("Alert successfully forwarded to Slack.", status_code=200)
-    except requests.exceptions.RequestException as e:
-        logging.error(f"Error sending message to Slack: {e}")
-        return func.HttpResponse(f"Error sending to Slack: {e}", status_code=500)
+
+async def send_to_slack(message: str) -> "httpx.Response":
+    """
+    Posts the message to Slack through the bulkhead and the circuit breaker.
+    The bulkhead keeps a burst of alerts from turning into a burst of Slack 429s.
+    Only Slack being unavailable trips the breaker, other 4xx responses mean Slack is up.
+    Including the bulkhead wait, this takes at most SLACK_SEND_TIMEOUT - SLACK_BATCH_WINDOW.
+    """
+    import httpx
+
+    async with _slack_bulkhead:
+        _slack_breaker.before_call()
+        try:
+            response = await post_to_slack(message, time.monotonic() + SLACK_POST_TIMEOUT)
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code in SLACK_RETRY_STATUS_CODES:
+                _slack_breaker.record_failure()
+            else:
+                _slack_breaker.record_success()
+            raise
+        except httpx.HTTPError:
+            _slack_breaker.record_failure()
+            raise
+        except BaseException:
+            # A bug or a cancellation says nothing about Slack, but must not leave the trial stuck
+            _slack_breaker.release_trial()
+            raise
+        _slack_breaker.record_success()
+        return response
+
+
+# Alert storms arrive as bursts of related alerts, and Slack throttles each webhook
+# to about one message per second, so messages are batched into a single post
+_slack_batcher = MessageBatcher(
+    send_to_slack,
+    window=SLACK_BATCH_WINDOW,
+    max_size=SLACK_BATCH_MAX_SIZE,
+    max_length=SLACK_BATCH_MAX_LENGTH,
+    separator=SLACK_BATCH_SEPARATOR,
+)
+
+
+async def process_alert(data: dict, deadline: float) -> "httpx.Response":
+    """
+    Fetches the alert details, builds the Slack message, and sends it to Slack with the current batch.
+    While the breaker or the bulkhead short-circuits the send, or Slack stays unavailable through
+    post_to_slack's retries, it waits and tries again. A send is only started if it can finish
+    before deadline (a time.monotonic() value), and is never cancelled once started.
+    """
+    import httpx
+
+    details = await get_details_string(data)
+    message = build_slack_message(data, details)
+    while True:
+        if time.monotonic() + SLACK_SEND_TIMEOUT > deadline:
+            raise TimeoutError("Not enough time left to send the alert to Slack.")
+        try:
+            return await _slack_batcher.add(message)
+        except (CircuitOpenError, BulkheadFullError, httpx.TransportError, httpx.HTTPStatusError) as e:
+            if isinstance(e, httpx.HTTPStatusError) and e.response.status_code not in SLACK_RETRY_STATUS_CODES:
+                raise
+            # Jitter spreads the waiting alerts out so they don't all retry at the same moment
+            delay = (_slack_breaker.get_retry_after() or 0) + random.uniform(0, SLACK_SHORT_CIRCUIT_RETRY_DELAY)
+            if time.monotonic() + delay + SLACK_SEND_TIMEOUT > deadline:
+                raise
+            logger.debug("Slack send failed, retrying in %.1fs: %s", delay, e)
+            await asyncio.sleep(delay)
 
 
 @app.route(route="alert_to_slack", auth_level=func.AuthLevel.ANONYMOUS, methods=["POST"])
-def alert_to_slack(req: func.HttpRequest) -> func.HttpResponse:
+@app.queue_output(arg_name="msg", queue_name=SLACK_ALERTS_QUEUE, connection="AzureWebJobsStorage")
+def alert_to_slack(req: func.HttpRequest, msg: func.Out[str]) -> func.HttpResponse:
     """
-    Receives an alert from Azure Monitor, formats it, and sends it to Slack via webhook.
+    Receives an alert from Azure Monitor and queues it for delivery to Slack.
+    Azure Monitor only needs a 2xx, so it doesn't wait on the App Insights and Slack round-trips.
     """
-    logging.info("alert_to_slack received a request.")
+    logger.debug("alert_to_slack received a request.")
 
     provided_code = req.params.get("code")
     auth_response = validate_function_key(provided_code)
     if auth_response:
         return auth_response
-    logging.info("alert_to_slack got a valid code.")
+    logger.debug("alert_to_slack got a valid code.")
 
     try:
-        alert_payload = req.get_json()
-    except ValueError:
+        alert_payload = orjson.loads(req.get_body())
+    except orjson.JSONDecodeError:
         return func.HttpResponse("Request body is not valid JSON.", status_code=400)
     
-    logging.info("alert_to_slack got a valid JSON in the request.")
+    logger.debug("alert_to_slack got a valid JSON in the request.")
 
     data = alert_payload.get("data", {})
 
-    data_str = json.dumps(data, indent=2)  # pretty print 2 spaces indent
-    if len(data_str) > 10000:  # 1 byte per char, roughly 10KB, Azure limits to 64KB
-        data_str = data_str[:10000] + "... [truncated]"
-    logging.info(f"Received Azure alert data:\n{data_str}")
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("Received Azure alert data:\n%s", format_log_payload(data))
+
+    queued_alert = orjson.dumps(get_queued_alert(data))
+    if len(queued_alert) > SLACK_ALERTS_MAX_MESSAGE_SIZE:
+        logger.error("Alert is too large to queue (%s bytes).", len(queued_alert))
+        return func.HttpResponse("Alert is too large to queue.", status_code=413)
+    msg.set(queued_alert.decode())
+    return func.HttpResponse("Alert queued for forwarding to Slack.", status_code=202)
 
-    details = get_details_string(data)
-    message = build_slack_message(data, details)
-    slack_response = send_to_slack(message)
 
-    return slack_response
+@app.queue_trigger(arg_name="msg", queue_name=SLACK_ALERTS_QUEUE, connection="AzureWebJobsStorage")
+async def deliver_alert_to_slack(msg: func.QueueMessage) -> None:
+    """
+    Formats a queued alert and sends it to Slack via webhook.
+    Raising leaves the message on the queue, so the runtime retries it after the visibility
+    timeout and moves it to the poison queue after SLACK_ALERTS_MAX_DEQUEUE_COUNT attempts.
+    """
+    deadline = time.monotonic() + SLACK_DELIVERY_TIMEOUT
+    data = orjson.loads(msg.get_body())
+    try:
+        response = await process_alert(data, deadline)
+    except Exception:
+        if (msg.dequeue_count or 0) >= SLACK_ALERTS_MAX_DEQUEUE_COUNT:
+            logger.error("Giving up on alert %s, moving it to the poison queue.", msg.id)
+        raise
+    logger.info("Successfully sent message to Slack. Status: %s", response.status_code)
 
 
 @app.route(route="health", auth_level=func.AuthLevel.ANONYMOUS, methods=["GET"])
@@ -225,5 +720,16 @@ def health_check(req: func.HttpRequest) -> func.HttpResponse:
     """
     A simple health check endpoint
     """
-    logging.info("Health check endpoint was triggered.")
-    return func.HttpResponse("Healthy.", status_code=200)
\ No newline at end of file
+    logger.info("Health check endpoint was triggered.")
+    return func.HttpResponse("Healthy.", status_code=200)
+
+
+@app.warm_up_trigger("warmup")
+def warmup(warmup: WarmUpContext) -> None:  # the parameter name must match the binding name
+    """
+    Runs when a new instance is added, before it receives traffic.
+    Creates the outbound clients so the first alert doesn't pay for importing httpx.
+    """
+    get_slack_transport()
+    get_client("appinsights")
+    logger.info("Function App instance is warm.")
\ No newline at end of file
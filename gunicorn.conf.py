@@ -1,5 +1,6 @@
 # Gunicorn configuration file
 import multiprocessing
+import os
 
 max_requests = 1000
 max_requests_jitter = 50
@@ -9,7 +10,10 @@ accesslog = "/tmp/gunicorn.access.log"
 
 bind = "0.0.0.0:50505"
 
-workers = (multiprocessing.cpu_count() * 2) + 1
-threads = workers
+# One worker per CPU, with threads for concurrency within each worker.
+# WEB_CONCURRENCY overrides the worker count when the container gets a fractional CPU.
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "gthread"
+threads = 4
 
 timeout = 120
\ No newline at end of file